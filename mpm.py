@@ -1,7 +1,8 @@
 """Magic Password Manager: A Password management program.
 
-This program allows a user to create passwords and store them in a csv file.
-The content of the csv file is encrypted / decrypted with a master password.
+This program allows a user to create passwords and store them in a database file.
+Each row of the database file is encrypted / decrypted with a key derived from
+a master password.
 New passwords are created using characters from lower case and upper case
 letters, numbers and punctuation characters.
 
@@ -13,20 +14,39 @@ letters, numbers and punctuation characters.
     project.py delete-db -d magicpwds
     project.py add -d magicpwds -t "Hogwarts Students Magic Web" -u ron1980ash -l 10
     project.py remove -d magicpwds -i 7
+    project.py migrate-db -d magicpwds
 """
 
 
 import argparse
+import base64
+import binascii
 import csv
 import getpass
-import glob
+import hashlib
+import hmac
+import json
 import os
-import random
+import secrets
 import string
 import sys
+import unicodedata
+from collections.abc import Iterator
 
-import cryptocode
-import tabulate
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+
+SALT_SIZE: int = 16
+NONCE_SIZE: int = 12
+TAG_SIZE: int = 16
+RECORD_LENGTH_SIZE: int = 4
+
+# Character groups used for random passwords. The rest characters are taken from the first group.
+CHARACTER_GROUPS: tuple[str, ...] = (string.ascii_lowercase, string.ascii_uppercase, string.digits, string.punctuation)
+
+# Random number generator for passwords, which uses the operating system's secure source of randomness
+RNG: secrets.SystemRandom = secrets.SystemRandom()
 
 
 def main():
@@ -48,7 +68,8 @@ def main():
         while True:
             master_pwd: str = getpass.getpass(prompt=PROMPT_MASTER_PWD_NEW)
             master_pwd_repeat: str = getpass.getpass(prompt=PROMPT_MASTER_PWD_REPEAT)
-            if master_pwd == master_pwd_repeat:
+            # Compare in constant time, so the comparison does not leak how many characters match
+            if hmac.compare_digest(master_pwd.encode("utf-8"), master_pwd_repeat.encode("utf-8")):
                 break
             else:
                 print("The passwords did not match, please try again!\n")
@@ -73,22 +94,24 @@ def main():
         except Exception as err:
             sys.exit(f"Unexpected Error: {err}")
         
-        print(tabulate.tabulate(rows, headers="firstrow", tablefmt="rounded_outline"))
+        print_rows(rows)
     
     elif args.command == "delete-db":
         try:
             delete_database(args.database)
             print("Database deleted successfully.")
-        except FileNotFoundError:
-            print(f"Error: {err}")
+        except FileNotFoundError as err:
+            sys.exit(f"Error: {err}")
         except Exception as err:
             sys.exit(f"Unexpected Error: {err}")
     
     elif args.command == "add":
         master_pwd: str = getpass.getpass(PROMPT_MASTER_PWD)
         
+        password: str = create_random_password(args.password_length)
+        
         try:
-            rows: list[list[str]] = open_database(args.database, master_pwd)
+            rows: list[list[str]] = append_row(args.database, master_pwd, [args.title, args.username, password])
         except FileNotFoundError as err:
             sys.exit(f"Error: {err}")
         except ValueError as err:
@@ -96,18 +119,30 @@ def main():
         except Exception as err:
             sys.exit(f"Unexpected Error: {err}")
         
-        index: str = str(len(rows))
-        password: str = create_random_password(args.password_length)
-        rows.append([index, args.title, args.username, password])
-        save_database(args.database, master_pwd, rows)
-        
-        print(tabulate.tabulate(rows, headers="firstrow", tablefmt="rounded_outline"))
+        print_rows(rows)
 
     elif args.command == "remove":
         master_pwd: str = getpass.getpass(prompt=PROMPT_MASTER_PWD)
         
         try:
-            rows: list[list[str]] = open_database(args.database, master_pwd)
+            rows: list[list[str]] = remove_row(args.database, master_pwd, args.index)
+        except FileNotFoundError as err:
+            sys.exit(f"Error: {err}")
+        except ValueError as err:
+            sys.exit(f"Error: {err}")
+        except IndexError as err:
+            sys.exit(f"Could not remove item: {err}\n")
+        except Exception as err:
+            sys.exit(f"Unexpected Error: {err}")
+        
+        print_rows(rows)
+
+    elif args.command == "migrate-db":
+        master_pwd: str = getpass.getpass(prompt=PROMPT_MASTER_PWD)
+        
+        try:
+            rows: list[list[str]] = migrate_database(args.database, master_pwd)
+            print("Database migrated successfully.")
         except FileNotFoundError as err:
             sys.exit(f"Error: {err}")
         except ValueError as err:
@@ -115,62 +150,60 @@ def main():
         except Exception as err:
             sys.exit(f"Unexpected Error: {err}")
         
-        if args.index not in range(1, len(rows)):
-            sys.exit("Could not remove item: Invalid index\n")
-        else:
-            rows.pop(args.index)
-            
-            # Re-index rows
-            for index, row in enumerate(rows):
-                if index > 0:
-                    row[0] = str(index)
-            
-            save_database(args.database, master_pwd, rows)
-            print(tabulate.tabulate(rows, headers="firstrow", tablefmt="rounded_outline"))
-
-
-def get_database_names(search_pattern: str = "*.mpmdb") -> list[str]:
-    """Searches for files that match a pattern.
+        print_rows(rows)
+
+
+def get_database_names(extension: str = ".mpmdb") -> list[str]:
+    """Searches the current working directory for files with a file extension.
 
     Args:
-        search_pattern (str, optional): The file search pattern. Defaults to "*.mpmdb".
+        extension (str, optional): The file extension. Defaults to ".mpmdb".
 
     Returns:
-        list[str]: A list of file names that match the pattern, without the file extension.
+        list[str]: A list of file names with that extension, without the file extension.
     """
     
-    db_files: list[str] = glob.glob(search_pattern)
-    db_names: list[str] = [db_file.split(".")[0] for db_file in db_files]
+    # Only the extension is removed, so database names may contain dots
+    db_names: list[str] = [
+        entry.name.removesuffix(extension) for entry in os.scandir(".")
+        if entry.is_file() and entry.name.endswith(extension)]
     return db_names
 
 
 def create_empty_database(database: str, master_pwd: str) -> None:
-    """Creates a csv file which only contains the header row.
+    """Creates a database file which only contains the header row.
 
     Args:
         database (str): The name of the database to be created.
-        master_pwd (str): Password used for encrypting each cell item.
+        master_pwd (str): Password used for encrypting the database.
 
     Raises:
         FileExistsError: The database file already exists.
     """
     
     db_file: str = database + ".mpmdb"
-    if os.path.exists(db_file):
-        raise FileExistsError("A database with that name already exists")
-
     row_header = ["index", "title", "username", "password"]
-    with open(db_file, "w") as file:
-        file_writer = csv.writer(file)
-        file_writer.writerow([cryptocode.encrypt(column, master_pwd) for column in row_header])
+    
+    salt: bytes = os.urandom(SALT_SIZE)
+    data: bytes = encrypt_rows([row_header], derive_key(master_pwd, salt), salt)
+    
+    # Exclusive creation lets the file system check whether the file exists.
+    # The data is encrypted first, so no empty file is left behind if that fails.
+    try:
+        file = open(db_file, "xb")
+    except FileExistsError:
+        raise FileExistsError("A database with that name already exists")
+    
+    with file:
+        file.write(data)
 
 
 def open_database(database: str, master_pwd: str) -> list[list[str]]:
-    """Opens an existing csv file.
+    """Opens an existing database file.
 
     Args:
         database (str): The name of the database to open.
-        master_pwd (str): Password used for decrypting each cell item.
+        master_pwd (str): Password used for decrypting the database.
 
     Raises:
         FileNotFoundError: The database file does not exist.
@@ -180,43 +213,400 @@ def open_database(database: str, master_pwd: str) -> list[list[str]]:
         list[list[str]]: A list of rows containing the header row and rows with password information.
     """
     
+    data: bytes = read_database_file(database)
+    return list(decrypt_rows(data, derive_key(master_pwd, read_salt(data))))
+
+
+def read_database_file(database: str) -> bytes:
+    """Reads the encrypted content of a database file.
+
+    Args:
+        database (str): The name of the database.
+
+    Raises:
+        FileNotFoundError: The database file does not exist.
+
+    Returns:
+        bytes: The content of the database file.
+    """
+    
     db_file: str = database + ".mpmdb"
-    if not os.path.exists(db_file):
+    try:
+        with open(db_file, "rb") as file:
+            return file.read()
+    except FileNotFoundError:
         raise FileNotFoundError("Database file not found")
+    
+    
+def save_database(database: str, master_pwd: str, rows: list[list[str]]) -> None:
+    """Saves a list of rows to a database file.
+
+    Args:
+        database (str): The name of the database to save to.
+        master_pwd (str): Password used for encrypting the database.
+        rows (list[list[str]]): A list of rows containing the header row and rows with password information.
+    """
+    
+    db_file: str = database + ".mpmdb"
+    salt: bytes = os.urandom(SALT_SIZE)
+    data: bytes = encrypt_rows(rows, derive_key(master_pwd, salt), salt)
+    with open(db_file, "wb") as file:
+        file.write(data)
 
-    with open(db_file, "r") as file:
-        file_reader = csv.reader(file)
-        password_rows: list[list[str]] = [row for row in file_reader]
 
-    password_rows_decrypted: list[list[str]] = []
-    for row in password_rows:
-        row_decrypted = [cryptocode.decrypt(column, master_pwd) for column in row]
-        password_rows_decrypted.append(row_decrypted)
+def remove_row(database: str, master_pwd: str, index: int) -> list[list[str]]:
+    """Removes a row from an existing database file and re-indexes the other rows.
     
-    if password_rows_decrypted[0][0] != "index":
-        raise ValueError("Master password incorrect")
+    The key is derived once and used for both decrypting and encrypting the rows.
+
+    Args:
+        database (str): The name of the database.
+        master_pwd (str): Password used for decrypting and encrypting the database.
+        index (int): The index of the row to be removed.
+
+    Raises:
+        FileNotFoundError: The database file does not exist.
+        ValueError: The password used for decrypting is incorrect.
+        IndexError: There is no row with that index.
+
+    Returns:
+        list[list[str]]: The remaining rows, including the header row.
+    """
     
-    return password_rows_decrypted
+    data: bytes = read_database_file(database)
+    salt: bytes = read_salt(data)
+    key: bytes = derive_key(master_pwd, salt)
+    rows: list[list[str]] = list(decrypt_rows(data, key))
     
+    if index not in range(1, len(rows)):
+        raise IndexError("Invalid index")
+    rows.pop(index)
     
-def save_database(database: str, master_pwd: str, rows: list[list[str]]) -> None:
-    """Saves a list of rows to a csv file.
+    # Re-index rows
+    for row_index in range(1, len(rows)):
+        rows[row_index][0] = str(row_index)
+    
+    db_file: str = database + ".mpmdb"
+    with open(db_file, "wb") as file:
+        file.write(encrypt_rows(rows, key, salt))
+    
+    return rows
+
+
+def read_salt(data: bytes) -> bytes:
+    """Returns the salt at the start of the content of a database file.
+
+    Args:
+        data (bytes): The salt, followed by one record per row.
+
+    Raises:
+        ValueError: The data is too short to contain a salt and a record or uses the old file format.
+
+    Returns:
+        bytes: The salt.
+    """
+    
+    if is_legacy_database(data):
+        raise ValueError("Database file uses the old file format, use the 'migrate-db' subcommand to convert it")
+    
+    # Fail before the expensive key derivation if the data cannot contain a salt and a record
+    if len(data) < SALT_SIZE + RECORD_LENGTH_SIZE + NONCE_SIZE + TAG_SIZE:
+        raise ValueError("Database file is invalid")
+    
+    return data[:SALT_SIZE]
+
+
+def derive_key(master_pwd: str, salt: bytes) -> bytes:
+    """Derives an encryption key from a master password.
+    
+    The key derivation is expensive, so it should only run once per command.
+
+    Args:
+        master_pwd (str): The master password.
+        salt (bytes): The random salt stored at the start of the database file.
+
+    Returns:
+        bytes: A 256 bit key for AES-GCM.
+    """
+    
+    return hashlib.scrypt(master_pwd.encode("utf-8"), salt=salt, n=2**14, r=8, p=1, dklen=32)
+
+
+def build_associated_data(previous_tag: bytes, index: int, is_last: bool) -> bytes:
+    """Builds the data a record is authenticated together with.
+
+    Args:
+        previous_tag (bytes): The salt for the first record, the tag of the previous record otherwise.
+        index (int): The position of the record in the database file.
+        is_last (bool): Whether the record is the last record of the database file.
+
+    Returns:
+        bytes: The associated data for AES-GCM.
+    """
+    
+    return previous_tag + index.to_bytes(RECORD_LENGTH_SIZE, "big") + bytes([is_last])
+
+
+def encrypt_record(cipher: AESGCM, row: list[str], previous_tag: bytes, index: int, is_last: bool) -> bytes:
+    """Serializes a row to JSON and encrypts it with AES-GCM.
+
+    Args:
+        cipher (AESGCM): The cipher created from the key returned by derive_key().
+        row (list[str]): The row to encrypt.
+        previous_tag (bytes): The salt for the first record, the tag of the previous record otherwise.
+        index (int): The position of the record in the database file.
+        is_last (bool): Whether the record is the last record of the database file.
+
+    Returns:
+        bytes: The length of the ciphertext, the nonce and the ciphertext, in that order.
+    """
+    
+    plaintext: bytes = json.dumps(row, separators=(",", ":")).encode("utf-8")
+    nonce: bytes = os.urandom(NONCE_SIZE)
+    ciphertext: bytes = cipher.encrypt(nonce, plaintext, build_associated_data(previous_tag, index, is_last))
+    
+    return len(ciphertext).to_bytes(RECORD_LENGTH_SIZE, "big") + nonce + ciphertext
+
+
+def decrypt_record(cipher: AESGCM, nonce: bytes, ciphertext: bytes, previous_tag: bytes, index: int, is_last: bool) -> list[str]:
+    """Decrypts a record created by encrypt_record().
+
+    Args:
+        cipher (AESGCM): The cipher created from the key returned by derive_key().
+        nonce (bytes): The nonce of the record.
+        ciphertext (bytes): The ciphertext of the record.
+        previous_tag (bytes): The salt for the first record, the tag of the previous record otherwise.
+        index (int): The position of the record in the database file.
+        is_last (bool): Whether the record is the last record of the database file.
+
+    Raises:
+        ValueError: The password used for decrypting is incorrect or the database file was modified.
+
+    Returns:
+        list[str]: The decrypted row.
+    """
+    
+    try:
+        plaintext: bytes = cipher.decrypt(nonce, ciphertext, build_associated_data(previous_tag, index, is_last))
+    except InvalidTag:
+        if index > 0:
+            raise ValueError("Database file is invalid")
+        
+        # The header record also fails to verify if all records after it were cut off
+        try:
+            cipher.decrypt(nonce, ciphertext, build_associated_data(previous_tag, index, not is_last))
+        except InvalidTag:
+            raise ValueError("Master password incorrect")
+        raise ValueError("Database file is invalid")
+    
+    return json.loads(plaintext)
+
+
+def encrypt_rows(rows: list[list[str]], key: bytes, salt: bytes) -> bytes:
+    """Encrypts rows to the content of a database file.
+    
+    Each row is encrypted to its own record, so a row can be appended by only
+    decrypting the header record and the last record. Each record is authenticated
+    together with the tag of the previous record, its index and whether it is the
+    last record, so modified, reordered, removed or cut off records are detected.
 
     Args:
-        database (str): The name of the database to save to.
-        master_pwd (str): Password used for encrypting each cell item.
         rows (list[list[str]]): A list of rows containing the header row and rows with password information.
+        key (bytes): The key returned by derive_key().
+        salt (bytes): The salt the key was derived with.
+
+    Returns:
+        bytes: The salt, followed by one record per row.
+    """
+    
+    # The cipher is created once, so the key is only set up once for all records
+    cipher: AESGCM = AESGCM(key)
+    
+    records: list[bytes] = [salt]
+    previous_tag: bytes = salt
+    for index, row in enumerate(rows):
+        record: bytes = encrypt_record(cipher, row, previous_tag, index, index == len(rows) - 1)
+        records.append(record)
+        previous_tag = record[-TAG_SIZE:]
+    
+    return b"".join(records)
+
+
+def split_records(data: bytes) -> Iterator[tuple[bytes, bytes, bool]]:
+    """Splits the content of a database file into records without decrypting them.
+
+    Args:
+        data (bytes): The salt, followed by one record per row.
+
+    Raises:
+        ValueError: A record is truncated.
+
+    Yields:
+        tuple[bytes, bytes, bool]: The nonce and the ciphertext of a record, and whether it is the last record.
     """
     
+    position: int = SALT_SIZE
+    while position < len(data):
+        ciphertext_start: int = position + RECORD_LENGTH_SIZE + NONCE_SIZE
+        ciphertext_length: int = int.from_bytes(data[position:position + RECORD_LENGTH_SIZE], "big")
+        if ciphertext_length < TAG_SIZE or ciphertext_start + ciphertext_length > len(data):
+            raise ValueError("Database file is invalid")
+        
+        position = ciphertext_start + ciphertext_length
+        yield data[ciphertext_start - NONCE_SIZE:ciphertext_start], data[ciphertext_start:position], position == len(data)
+
+
+def decrypt_rows(data: bytes, key: bytes) -> Iterator[list[str]]:
+    """Decrypts data created by encrypt_rows() one row at a time.
+
+    Args:
+        data (bytes): The salt, followed by one record per row.
+        key (bytes): The key returned by derive_key() for the salt of the data.
+
+    Raises:
+        ValueError: The data is invalid or the password used for decrypting is incorrect.
+
+    Yields:
+        list[str]: The header row, followed by the rows with password information.
+    """
+    
+    salt: bytes = read_salt(data)
+    cipher: AESGCM = AESGCM(key)
+    
+    previous_tag: bytes = salt
+    for index, (nonce, ciphertext, is_last) in enumerate(split_records(data)):
+        yield decrypt_record(cipher, nonce, ciphertext, previous_tag, index, is_last)
+        previous_tag = ciphertext[-TAG_SIZE:]
+
+
+def append_row(database: str, master_pwd: str, entry: list[str]) -> list[list[str]]:
+    """Appends a row to an existing database file without rewriting the other rows.
+    
+    The file is read once. Only the header record and the last record are decrypted,
+    and only the last record is encrypted again, since it is no longer the last record.
+
+    Args:
+        database (str): The name of the database to append to.
+        master_pwd (str): Password used for encrypting the row.
+        entry (list[str]): The title, username and password of the new row. The index is added automatically.
+
+    Raises:
+        FileNotFoundError: The database file does not exist.
+        ValueError: The password used for encrypting is incorrect or the database file is invalid.
+
+    Returns:
+        list[list[str]]: The header row and the new row.
+    """
+    
+    data: bytes = read_database_file(database)
+    salt: bytes = read_salt(data)
+    cipher: AESGCM = AESGCM(derive_key(master_pwd, salt))
+    
+    # Decrypting the header row verifies the master password before anything is written.
+    # The last record is decrypted as well, so it can be encrypted again without the last record flag.
+    previous_tag: bytes = salt
+    for index, (nonce, ciphertext, is_last) in enumerate(split_records(data)):
+        if index == 0:
+            row_header: list[str] = decrypt_record(cipher, nonce, ciphertext, previous_tag, index, is_last)
+        if is_last:
+            last_row: list[str] = row_header if index == 0 else decrypt_record(cipher, nonce, ciphertext, previous_tag, index, is_last)
+            break
+        previous_tag = ciphertext[-TAG_SIZE:]
+    
+    row: list[str] = [str(index + 1)] + entry
+    last_record: bytes = encrypt_record(cipher, last_row, previous_tag, index, False)
+    new_record: bytes = encrypt_record(cipher, row, last_record[-TAG_SIZE:], index + 1, True)
+    
+    # The re-encrypted last record has the same length, so it is overwritten in place
     db_file: str = database + ".mpmdb"
-    with open(db_file, "w") as file:
-        file_writer = csv.writer(file)
-        for row in rows:
-            file_writer.writerow([cryptocode.encrypt(column, master_pwd) for column in row])
+    with open(db_file, "r+b") as file:
+        file.seek(len(data) - RECORD_LENGTH_SIZE - NONCE_SIZE - len(ciphertext))
+        file.write(last_record + new_record)
+    
+    return [row_header, row]
+
+
+def is_legacy_database(data: bytes) -> bool:
+    """Checks whether the content of a database file uses the old file format.
+    
+    The old file format is a csv file in which each cell was encrypted on its own
+    by cryptocode, which stores the ciphertext, salt, nonce and tag of a cell in
+    base64, separated by "*".
+
+    Args:
+        data (bytes): The content of a database file.
+
+    Returns:
+        bool: True if the content uses the old file format, False otherwise.
+    """
+    
+    try:
+        lines: list[str] = data.decode("ascii").splitlines()
+    except UnicodeDecodeError:
+        return False
+    
+    cells: list[str] = [cell for row in csv.reader(lines) for cell in row]
+    return len(cells) > 0 and all(cell.count("*") == 3 for cell in cells)
+
+
+def decrypt_legacy_cell(cell: str, master_pwd: str) -> str:
+    """Decrypts a cell of a database file in the old file format.
+
+    Args:
+        cell (str): The cell encrypted by cryptocode.
+        master_pwd (str): Password used for decrypting the cell.
+
+    Raises:
+        ValueError: The password used for decrypting is incorrect or the cell is invalid.
+
+    Returns:
+        str: The decrypted cell.
+    """
+    
+    try:
+        ciphertext, salt, nonce, tag = (base64.b64decode(part, validate=True) for part in cell.split("*"))
+    except binascii.Error:
+        raise ValueError("Database file is invalid")
+    
+    # cryptocode derives a key for each cell with the same scrypt parameters as derive_key()
+    try:
+        plaintext: bytes = AESGCM(derive_key(master_pwd, salt)).decrypt(nonce, ciphertext + tag, None)
+    except InvalidTag:
+        raise ValueError("Master password incorrect")
+    
+    return plaintext.decode("utf-8")
+
+
+def migrate_database(database: str, master_pwd: str) -> list[list[str]]:
+    """Converts a database file from the old file format to the current file format.
+
+    Args:
+        database (str): The name of the database.
+        master_pwd (str): Password used for decrypting and encrypting the database.
+
+    Raises:
+        FileNotFoundError: The database file does not exist.
+        ValueError: The database file does not use the old file format or the password is incorrect.
+
+    Returns:
+        list[list[str]]: The rows of the converted database.
+    """
+    
+    data: bytes = read_database_file(database)
+    if not is_legacy_database(data):
+        raise ValueError("Database file does not use the old file format")
+    
+    # All cells are decrypted before the file is overwritten
+    rows: list[list[str]] = [
+        [decrypt_legacy_cell(cell, master_pwd) for cell in row]
+        for row in csv.reader(data.decode("ascii").splitlines()) if row]
+    
+    save_database(database, master_pwd, rows)
+    return rows
 
 
 def delete_database(database: str) -> None:
-    """Deletes a csv file.
+    """Deletes a database file.
 
     Args:
         database (str): The name of the database to be deleted.
@@ -226,9 +616,10 @@ def delete_database(database: str) -> None:
     """
     
     db_file: str = database + ".mpmdb"
-    if not os.path.exists(db_file):
+    try:
+        os.remove(db_file)
+    except FileNotFoundError:
         raise FileNotFoundError("Database file not found")
-    os.remove(db_file)
 
 
 def create_random_password(password_length: int = 10) -> str:
@@ -250,21 +641,55 @@ def create_random_password(password_length: int = 10) -> str:
         password_length = MINIMUM_LENGTH
     
     # Determine how many characters to be used per group. The rest is added to the lower case group.
-    count_characters_per_group: int = password_length // 4
-    count_rest: int = password_length % 4
+    count_characters_per_group: int = password_length // len(CHARACTER_GROUPS)
+    count_rest: int = password_length % len(CHARACTER_GROUPS)
 
-    # Add characters of each group to a single list and make that list random
+    # Add characters of each group to a single list and make that list random.
+    # SystemRandom is used, since the default generator of the random module is not suitable for security purposes.
     password_characters: list[str] = []
-    password_characters += random.sample(string.ascii_lowercase, count_characters_per_group + count_rest)
-    password_characters += random.sample(string.ascii_uppercase, count_characters_per_group)
-    password_characters += random.sample(string.digits, count_characters_per_group)
-    password_characters += random.sample(string.punctuation, count_characters_per_group)
-    random.shuffle(password_characters)
+    for group in CHARACTER_GROUPS:
+        password_characters += [RNG.choice(group) for _ in range(count_characters_per_group)]
+    password_characters += [RNG.choice(CHARACTER_GROUPS[0]) for _ in range(count_rest)]
+    RNG.shuffle(password_characters)
     
     return "".join(password_characters)
 
 
-def parse_program_args() -> argparse.Namespace:
+def display_width(text: str) -> int:
+    """Calculates how many terminal columns a text takes up.
+
+    Args:
+        text (str): The text to measure.
+
+    Returns:
+        int: The count of columns. Wide characters (e.g. CJK) count twice, combining characters do not count.
+    """
+    
+    return sum(
+        0 if unicodedata.combining(char) else 2 if unicodedata.east_asian_width(char) in ("W", "F") else 1
+        for char in text)
+
+
+def print_rows(rows: list[list[str]]) -> None:
+    """Prints rows as a table, using the first row as the header.
+    
+    The column widths are calculated first, then each row is printed directly,
+    so the table is never built as a single string.
+
+    Args:
+        rows (list[list[str]]): A list of rows containing the header row and rows with password information.
+    """
+    
+    cell_widths: list[list[int]] = [[display_width(cell) for cell in row] for row in rows]
+    column_widths: list[int] = [max(widths[column] for widths in cell_widths) for column in range(len(rows[0]))]
+    
+    for index, (row, widths) in enumerate(zip(rows, cell_widths)):
+        print(" | ".join(cell + " " * (column_width - width) for cell, width, column_width in zip(row, widths, column_widths)))
+        if index == 0:
+            print("-+-".join("-" * width for width in column_widths))
+
+
+def create_parser() -> argparse.ArgumentParser:
     # Top-level parser
     parser = argparse.ArgumentParser(description="Magic Password Manager: Create and store passwords")
     subparsers = parser.add_subparsers(dest="command")
@@ -291,7 +716,18 @@ def parse_program_args() -> argparse.Namespace:
     parser_remove.add_argument("-d", "--database", metavar="DB_NAME", type=str, help="database name (without file extenstion)", required=True)
     parser_remove.add_argument("-i", "--index", metavar="INDEX", type=int, help="index of entry to be removed", required=True)
 
-    return parser.parse_args()
+    parser_migrate_db = subparsers.add_parser("migrate-db", help="convert a database from the old file format")
+    parser_migrate_db.add_argument("-d", "--database", metavar="DB_NAME", type=str, help="database name (without file extenstion)", required=True)
+
+    return parser
+
+
+# The parser is only created once, when the module is imported
+PARSER: argparse.ArgumentParser = create_parser()
+
+
+def parse_program_args() -> argparse.Namespace:
+    return PARSER.parse_args()
     
     
 if __name__ == "__main__":
@@ -1,10 +1,11 @@
+import base64
 import csv
 import os
 import random
 import string
 
-import cryptocode
 import pytest
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
 from mpm import get_database_names
 from mpm import create_random_password
@@ -12,6 +13,21 @@ from mpm import create_empty_database
 from mpm import save_database
 from mpm import open_database
 from mpm import delete_database
+from mpm import encrypt_rows
+from mpm import decrypt_rows
+from mpm import derive_key
+from mpm import read_salt
+from mpm import append_row
+from mpm import remove_row
+from mpm import migrate_database
+from mpm import print_rows
+from mpm import SALT_SIZE
+
+
+@pytest.fixture(autouse=True)
+def working_directory(tmp_path, monkeypatch) -> None:
+    # Each test runs in its own temporary directory, which is removed by pytest
+    monkeypatch.chdir(tmp_path)
 
 
 @pytest.fixture
@@ -19,6 +35,16 @@ def random_string() -> str:
     return "".join(random.sample(string.ascii_lowercase, 10))
 
 
+@pytest.fixture
+def salt() -> bytes:
+    return os.urandom(SALT_SIZE)
+
+
+@pytest.fixture
+def key(random_string, salt) -> bytes:
+    return derive_key(random_string, salt)
+
+
 @pytest.fixture
 def db_extension() -> str:
     return ".mpmdb"
@@ -29,6 +55,23 @@ def password_row() -> list[str]:
     return ["1", "Hogwarts Students Online", "ron.weasley@magic.wiz", "iLuvCakes123!"]
 
 
+@pytest.fixture
+def legacy_rows(random_string, db_extension, password_row) -> list[list[str]]:
+    # Writes a database file in the old file format, in which cryptocode encrypted each cell on its own
+    rows: list[list[str]] = [["index", "title", "username", "password"], password_row]
+    with open(random_string + db_extension, "w", newline="") as file:
+        file_writer = csv.writer(file)
+        for row in rows:
+            cells: list[str] = []
+            for cell in row:
+                salt, nonce = os.urandom(16), os.urandom(16)
+                ciphertext: bytes = AESGCM(derive_key(random_string, salt)).encrypt(nonce, cell.encode("utf-8"), None)
+                parts: tuple[bytes, ...] = (ciphertext[:-16], salt, nonce, ciphertext[-16:])
+                cells.append("*".join(base64.b64encode(part).decode("ascii") for part in parts))
+            file_writer.writerow(cells)
+    return rows
+
+
 @pytest.fixture
 def min_pwd_length() -> int:
     return 5
@@ -64,9 +107,21 @@ def test_get_database_names_contains_name(random_string, db_extension) -> None:
     db_names: list[str] = get_database_names()
     assert random_string in db_names
 
-    # Delete test file
-    if os.path.exists(random_db_file_name):
-        os.remove(random_db_file_name)
+
+def test_get_database_names_name_with_dots(random_string, db_extension) -> None:
+    db_name: str = random_string + ".backup"
+    with open(db_name + db_extension, "w") as file:
+        file.write("")
+
+    db_names: list[str] = get_database_names()
+    assert db_name in db_names
+
+
+def test_get_database_names_empty_extension(random_string) -> None:
+    with open(random_string, "w") as file:
+        file.write("")
+
+    assert get_database_names("") == [random_string]
 
 
 def test_get_database_names_empty_list(random_string) -> None:
@@ -126,16 +181,13 @@ def test_create_empty_database_file_created(random_string, db_extension):
     db_file: str = random_string + db_extension
     create_empty_database(random_string, random_string)
     
-    with open(db_file) as file:
-        file_reader = csv.reader(file)
-        password_rows: list[list[str]] = [row for row in file_reader]
-    
-    assert cryptocode.decrypt(password_rows[0][0], random_string) == "index"
-    
-    if os.path.exists(db_file):
-        os.remove(db_file)
-    
+    with open(db_file, "rb") as file:
+        data: bytes = file.read()
+    password_rows: list[list[str]] = list(decrypt_rows(data, derive_key(random_string, read_salt(data))))
     
+    assert password_rows[0][0] == "index"
+
+
 def test_create_empty_database_raises_file_exists_error(random_string, db_extension):
     db_file: str = random_string + db_extension
     with open(db_file, "w") as file:
@@ -143,34 +195,44 @@ def test_create_empty_database_raises_file_exists_error(random_string, db_extens
     
     with pytest.raises(FileExistsError):
         create_empty_database(random_string, random_string)
-    
-    if os.path.exists(db_file):
-        os.remove(db_file)
 
 
 def test_save_database_contains_row_data(random_string, db_extension, password_row):
     db_file: str = random_string + db_extension
     save_database(random_string, random_string, [password_row])
     
-    with open(db_file, "r") as file:
-        file_reader = csv.reader(file)
-        password_rows_encrypted: list[list[str]] = [row for row in file_reader]
+    with open(db_file, "rb") as file:
+        data: bytes = file.read()
+    password_rows: list[list[str]] = list(decrypt_rows(data, derive_key(random_string, read_salt(data))))
+    
+    assert password_rows[0][0] == password_row[0]
+    assert password_rows[0][1] == password_row[1]
+    assert password_rows[0][2] == password_row[2]
+
+
+def test_remove_row_removes_and_reindexes(random_string, password_row):
+    row_header: list[str] = ["index", "title", "username", "password"]
+    row: list[str] = ["2", "Gringotts", "ron1980ash", "Galleons42!"]
+    save_database(random_string, random_string, [row_header, password_row, row])
+    
+    rows: list[list[str]] = remove_row(random_string, random_string, 1)
     
-    assert cryptocode.decrypt(password_rows_encrypted[0][0], random_string) == password_row[0]
-    assert cryptocode.decrypt(password_rows_encrypted[0][1], random_string) == password_row[1]
-    assert cryptocode.decrypt(password_rows_encrypted[0][2], random_string) == password_row[2]
+    assert rows == [row_header, ["1"] + row[1:]]
+    assert open_database(random_string, random_string) == rows
+
+
+def test_remove_row_raises_index_error(random_string):
+    create_empty_database(random_string, random_string)
     
-    if os.path.exists(db_file):
-        os.remove(db_file)
+    with pytest.raises(IndexError):
+        remove_row(random_string, random_string, 1)
 
 
-def test_open_database_returns_correct_data(random_string, db_extension, password_row):
+def test_open_database_returns_correct_data(random_string, db_extension, password_row, key, salt):
     db_file: str = random_string + db_extension
     test_data_rows = [["index", "title", "username", "password"], password_row]
-    with open(db_file, "w") as file:
-        file_writer = csv.writer(file)
-        for row in test_data_rows:
-            file_writer.writerow([cryptocode.encrypt(column, random_string) for column in row])
+    with open(db_file, "wb") as file:
+        file.write(encrypt_rows(test_data_rows, key, salt))
     password_rows: list[list[str]] = open_database(random_string, random_string)
     
     assert password_rows[0][0] == "index"
@@ -181,11 +243,8 @@ def test_open_database_returns_correct_data(random_string, db_extension, passwor
     assert password_rows[1][1] == password_row[1]
     assert password_rows[1][2] == password_row[2]
     assert password_rows[1][3] == password_row[3]
-    
-    if os.path.exists(db_file):
-        os.remove(db_file)
-    
-    
+
+
 def test_open_database_raises_file_not_found_error(random_string, db_extension):
     with pytest.raises(FileNotFoundError):
         open_database(random_string, random_string)
@@ -199,9 +258,124 @@ def test_open_database_raises_value_error(random_string, db_extension):
     
     with pytest.raises(ValueError):
         open_database(random_string, random_string)
+
+
+def test_open_database_raises_value_error_wrong_password(random_string):
+    create_empty_database(random_string, random_string)
+    
+    with pytest.raises(ValueError, match="incorrect"):
+        open_database(random_string, random_string + "x")
+
+
+def test_open_database_raises_value_error_old_file_format(random_string, legacy_rows):
+    with pytest.raises(ValueError, match="migrate-db"):
+        open_database(random_string, random_string)
+
+
+def test_migrate_database_converts_old_file_format(random_string, legacy_rows):
+    assert migrate_database(random_string, random_string) == legacy_rows
+    assert open_database(random_string, random_string) == legacy_rows
+
+
+def test_migrate_database_raises_value_error_wrong_password(random_string, db_extension, legacy_rows):
+    with open(random_string + db_extension, "rb") as file:
+        data: bytes = file.read()
+    
+    with pytest.raises(ValueError, match="incorrect"):
+        migrate_database(random_string, random_string + "x")
+    
+    with open(random_string + db_extension, "rb") as file:
+        assert file.read() == data
+
+
+def test_migrate_database_raises_value_error_current_file_format(random_string):
+    create_empty_database(random_string, random_string)
+    
+    with pytest.raises(ValueError, match="does not use"):
+        migrate_database(random_string, random_string)
+
+
+def test_read_salt_raises_value_error_too_short():
+    with pytest.raises(ValueError, match="invalid"):
+        read_salt(b"")
+
+
+def test_encrypt_rows_decrypt_rows_round_trip(password_row, key, salt):
+    rows: list[list[str]] = [["index", "title", "username", "password"], password_row]
+    
+    assert list(decrypt_rows(encrypt_rows(rows, key, salt), key)) == rows
+
+
+def test_decrypt_rows_raises_value_error_reordered_rows(password_row, key, salt):
+    rows: list[list[str]] = [["index", "title", "username", "password"], password_row, password_row]
+    data: bytes = encrypt_rows(rows, key, salt)
+    
+    # Swap the last two records, which have the same length
+    record_length: int = len(encrypt_rows([password_row], key, salt)) - SALT_SIZE
+    header_end: int = len(data) - 2 * record_length
+    data_reordered: bytes = data[:header_end] + data[-record_length:] + data[header_end:-record_length]
+    
+    with pytest.raises(ValueError, match="invalid"):
+        list(decrypt_rows(data_reordered, key))
+
+
+def test_decrypt_rows_raises_value_error_truncated_rows(password_row, key, salt):
+    rows: list[list[str]] = [["index", "title", "username", "password"], password_row, password_row]
+    data: bytes = encrypt_rows(rows, key, salt)
+    
+    # Cut off the last record
+    record_length: int = len(encrypt_rows([password_row], key, salt)) - SALT_SIZE
+    
+    with pytest.raises(ValueError, match="invalid"):
+        list(decrypt_rows(data[:-record_length], key))
+
+
+def test_decrypt_rows_raises_value_error_truncated_to_header(password_row, key, salt):
+    rows: list[list[str]] = [["index", "title", "username", "password"], password_row]
+    data: bytes = encrypt_rows(rows, key, salt)
+    
+    # Cut off all records after the header record
+    record_length: int = len(encrypt_rows([password_row], key, salt)) - SALT_SIZE
     
-    if os.path.exists(db_file):
-        os.remove(db_file)
+    with pytest.raises(ValueError, match="invalid"):
+        list(decrypt_rows(data[:-record_length], key))
+
+
+def test_append_row_appends_row(random_string, password_row):
+    rows: list[list[str]] = [["index", "title", "username", "password"], password_row]
+    save_database(random_string, random_string, rows)
+    
+    row: list[str] = ["2", "Gringotts", "ron1980ash", "Galleons42!"]
+    
+    assert append_row(random_string, random_string, row[1:]) == [rows[0], row]
+    assert open_database(random_string, random_string) == rows + [row]
+
+
+def test_append_row_appends_to_empty_database(random_string, password_row):
+    create_empty_database(random_string, random_string)
+    
+    append_row(random_string, random_string, password_row[1:])
+    append_row(random_string, random_string, password_row[1:])
+    
+    assert open_database(random_string, random_string)[1:] == [password_row, ["2"] + password_row[1:]]
+
+
+def test_append_row_raises_value_error(random_string, db_extension, password_row):
+    create_empty_database(random_string, random_string)
+    with open(random_string + db_extension, "rb") as file:
+        data: bytes = file.read()
+    
+    with pytest.raises(ValueError):
+        append_row(random_string, random_string + "x", password_row[1:])
+    
+    with open(random_string + db_extension, "rb") as file:
+        assert file.read() == data
+
+
+def test_encrypt_rows_decrypt_rows_keeps_line_breaks(key, salt):
+    rows: list[list[str]] = [["index", "title", "username", "password"], ["1", "Line\r\nBreak", "Line\nFeed", "Return\r"]]
+    
+    assert list(decrypt_rows(encrypt_rows(rows, key, salt), key)) == rows
 
 
 def test_delete_database_file_deleted(random_string, db_extension):
@@ -217,3 +391,21 @@ def test_delete_database_file_deleted(random_string, db_extension):
 def test_delete_database_file_not_found_error(random_string):
     with pytest.raises(FileNotFoundError):
         delete_database(random_string)
+
+
+def test_print_rows_aligns_columns(capsys, password_row):
+    print_rows([["index", "title", "username", "password"], password_row])
+    lines: list[str] = capsys.readouterr().out.splitlines()
+    
+    assert lines[0] == "index | title                    | username              | password     "
+    assert lines[1] == "------+--------------------------+-----------------------+--------------"
+    assert lines[2] == "1     | Hogwarts Students Online | ron.weasley@magic.wiz | iLuvCakes123!"
+
+
+def test_print_rows_aligns_wide_characters(capsys):
+    print_rows([["index", "title"], ["1", "魔法"], ["2", "abc"]])
+    lines: list[str] = capsys.readouterr().out.splitlines()
+    
+    assert lines[0] == "index | title"
+    assert lines[2] == "1     | 魔法 "
+    assert lines[3] == "2     | abc  "